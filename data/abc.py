@@ -179,15 +179,22 @@ class ABCPreProcessor(PreProcessor):
     # =============================================
     # Run transformations on the dataset to prepare
     # for use with deep learning models
+    # Densified tunes are cached once (in memory, or
+    # on disk when a cache path is given) before
+    # being shuffled and repeated
     # =============================================
-    def prepare_dataset(self, parsed_dataset, batch_size = 16):
+    def prepare_dataset(self, parsed_dataset, batch_size = 16, shuffle_buffer_size = 1000, cache_path = ''):
         return (
             parsed_dataset
             .filter(self.filter_max_length)
-            .map(self.__pad_to_max_length__)
+            .map(
+                self.__pad_to_max_length__,
+                num_parallel_calls = tf.data.experimental.AUTOTUNE
+            )
+            .cache(cache_path)
+            .shuffle(shuffle_buffer_size)
             .repeat()
-            .cache()
-            .batch(batch_size)
+            .batch(batch_size, drop_remainder = True)
             .prefetch(tf.data.experimental.AUTOTUNE)
         )
     # =============================================
@@ -234,9 +241,17 @@ class ABCPreProcessor(PreProcessor):
 
     # =============================================
     # Run transformations on elements in the raw
-    # dataset 
+    # dataset - densify the padded token sequences
+    # so models receive dense int32 tensors
     # =============================================
     def __pad_to_max_length__(self, context, sequence):
+        sequence = {
+            key: tf.reshape(
+                tf.cast(tf.sparse.to_dense(value), tf.int32),
+                [MAX_TIMESTEPS_FOR_ABC_MODEL - 1]
+            )
+            for key, value in sequence.items()
+        }
         return context, sequence
     # =============================================
 
@@ -13,14 +13,9 @@ def load_musical_vocab(vocab_path):
     else:
         return {}
 
-def scheduler(epoch, lr):
-    if epoch < 10:
-        return lr
-    else:
-        return lr * tf.math.exp(-0.1)
-
 DEFAULT_TRAIN_CONFIG = {
     'print_outputs_frequency': 100,
+    'summary_frequency': 50,
     'save_frequency': 100,
     'num_epochs': 100,
     'validation_freq': 1000,
@@ -33,14 +28,28 @@ DEFAULT_LR_CONFIG = {
     'decay_steps': 100000,
 }
 
+# (start token ids, end token id, temperature) for the traced generation loops
+GENERATE_TUNE_SIGNATURE = [
+    tf.TensorSpec(shape=[1, None], dtype=tf.int32),
+    tf.TensorSpec(shape=[], dtype=tf.int32),
+    tf.TensorSpec(shape=[], dtype=tf.float32),
+]
+
 class FolkLSTM(tf.keras.Model):
 
     def __init__(self, model_path, data_dimensions, vocab_path = None, training=True, learning_rate = DEFAULT_LR_CONFIG):
         super(FolkLSTM, self).__init__()
         
         self.data_dimensions = data_dimensions
+        self.max_timesteps = data_dimensions['max_timesteps']
         self.model_path = model_path
         self.vocab = load_musical_vocab(os.path.join(vocab_path, 'tunes_vocab.json'))
+        # Index 0 is the padding token and maps to an empty string
+        idx_to_word = self.vocab.get('idx_to_word', {})
+        self.idx_to_word = np.array(
+            [''] + [idx_to_word[str(idx)] for idx in range(1, len(idx_to_word) + 1)],
+            dtype = object
+        )
 
         self.tensorboard_logdir = os.path.join(
             model_path,
@@ -60,6 +69,13 @@ class FolkLSTM(tf.keras.Model):
                 print(self.model_configs)
         saved_model_dir = os.path.join(self.model_path, 'folk_lstm')
 
+        # 'mixed_bfloat16' on CPU/TPU or 'mixed_float16' on GPU runs the
+        # LSTM matmuls in half precision while keeping variables in float32.
+        # The policy is handed to this model's layers instead of being set
+        # globally, so other models in the same process are unaffected
+        self.precision_policy = self.model_configs.get('precision_policy', 'float32')
+        self.layer_policy = tf.keras.mixed_precision.experimental.Policy(self.precision_policy)
+
         self.model = self.__create_model__(self.model_configs, data_dimensions, training)
         
         initial_learning_rate = learning_rate['initial_lr']
@@ -70,8 +86,40 @@ class FolkLSTM(tf.keras.Model):
           initial_learning_rate, decay_steps, end_learning_rate, power=3
         )
 
-        self.cross_entropy = tf.keras.losses.SparseCategoricalCrossentropy(from_logits=True)
+        self.cross_entropy = tf.keras.losses.SparseCategoricalCrossentropy(
+            from_logits = True,
+            reduction = tf.keras.losses.Reduction.NONE
+        )
         self.optimizer = tf.keras.optimizers.Adam(learning_rate_fn)
+        # float16 gradients underflow without loss scaling, bfloat16 does not need it
+        self.loss_scaling = self.precision_policy == 'mixed_float16'
+        if self.loss_scaling:
+            self.optimizer = tf.keras.mixed_precision.experimental.LossScaleOptimizer(
+                self.optimizer,
+                loss_scale = 'dynamic'
+            )
+
+        if training:
+            # Batch size and timesteps are fixed so XLA can specialise the
+            # whole step; compiling adds latency to the first step, so it is opt-in
+            batch_shape = [data_dimensions['batch_size'], self.max_timesteps]
+            self.train_step_fn = tf.function(
+                self._train_step,
+                input_signature = [
+                    tf.TensorSpec(shape=batch_shape, dtype=tf.int32),
+                    tf.TensorSpec(shape=batch_shape, dtype=tf.int32),
+                ],
+                experimental_compile = bool(self.model_configs.get('jit_compile', False))
+            ).get_concrete_function()
+        else:
+            self.generate_tune = tf.function(
+                self._generate_tune,
+                input_signature = GENERATE_TUNE_SIGNATURE
+            )
+        self.tflite_path = os.path.join(self.model_path, 'folk_lstm.tflite')
+        self.tflite_interpreter = None
+        self.tflite_states = None
+        self.generate_tune_fast = None
         
         
         self.ckpt = tf.train.Checkpoint(
@@ -84,8 +132,19 @@ class FolkLSTM(tf.keras.Model):
             os.path.join(self.model_path, 'ckpt'),
             max_to_keep = 3
         )
-        self.ckpt.restore(self.ckpt_manager.latest_checkpoint)
+        restore_status = self.ckpt.restore(self.ckpt_manager.latest_checkpoint)
         if self.ckpt_manager.latest_checkpoint:
+            # Checkpoints from the older StackedRNNCells model only match the
+            # embedding, which would leave the LSTM stack randomly initialised
+            try:
+                restore_status.assert_existing_objects_matched()
+            except AssertionError as error:
+                raise ValueError(
+                    "Checkpoint {} does not match this model's layers. It was probably "
+                    "written by the older cell-based FolkLSTM and has to be retrained.".format(
+                        self.ckpt_manager.latest_checkpoint
+                    )
+                ) from error
             print("Restored from {}".format(self.ckpt_manager.latest_checkpoint))
         else:
             print("Initializing from scratch.")
@@ -99,31 +158,37 @@ class FolkLSTM(tf.keras.Model):
         #----------------------------------------
         if training:
             batch_size = data_dimensions['batch_size']
+            max_timesteps = self.max_timesteps
         else:
             batch_size = 1
+            max_timesteps = None
         stateful = not training
         tune = tf.keras.Input(
-            batch_input_shape = (batch_size, data_dimensions['max_timesteps'], 1),
+            batch_input_shape = (batch_size, max_timesteps),
+            dtype = tf.int32,
         )
+        # Padding mask is computed once from the token ids and handed to the RNN
+        tune_mask = tf.math.not_equal(tune, 0)
         #----------------------------------------
         tune_embedding_size = int(model_configs['tune_embedding_size'])
-        tune_embedding = tf.keras.layers.Embedding(
+        tune_tensor = tf.keras.layers.Embedding(
             input_dim = data_dimensions['tune_vocab_size'],
             output_dim = tune_embedding_size,
             name = 'tune_embedding',
-            mask_zero = True
+            dtype = self.layer_policy,
         )(tune)
-        tune_tensor = tf.keras.layers.Reshape((-1, tune_embedding_size))(tune_embedding)
         #----------------------------------------                
-        stacked_cells = tf.keras.layers.StackedRNNCells(
-            self.create_RNN_cells(model_configs['rnn'])
-        )
-
-        self.sequential_RNN = self.create_RNN_layer(stacked_cells, stateful)
+        RNN_layers = self.create_RNN_layers(model_configs['rnn'], stateful, dtype = self.layer_policy)
 
-        rnn_output = self.sequential_RNN(tune_tensor)
+        rnn_output = tune_tensor
+        for RNN_layer in RNN_layers:
+            rnn_output = RNN_layer(rnn_output, mask=tune_mask)
         #----------------------------------------
-        next_tokens = tf.keras.layers.Dense(data_dimensions['tune_vocab_size'])(rnn_output)
+        # Logits stay in float32 for a numerically stable softmax
+        next_tokens = tf.keras.layers.Dense(
+            data_dimensions['tune_vocab_size'],
+            dtype = 'float32'
+        )(rnn_output)
         #----------------------------------------
         model = tf.keras.Model(
             inputs=tune,
@@ -133,79 +198,132 @@ class FolkLSTM(tf.keras.Model):
         return model
 
 
-    def create_RNN_cells(self, configs):
+    def create_RNN_layers(self, configs, stateful = False, go_backwards = False, return_state = False, dtype = None):
+        # Full LSTM/GRU layers dispatch to the fused cuDNN/oneDNN kernels,
+        # which a generic RNN wrapper around cells never does
         if configs['unit_type'] == 'lstm':
-            RNN_unit = tf.keras.layers.LSTMCell
+            RNN_layer = tf.keras.layers.LSTM
         else:
-            RNN_unit = tf.keras.layers.GRUCell
-        return [RNN_unit(int(configs['num_units'])) for _ in range(int(configs['num_layers']))]
-
-
-    def create_RNN_layer(self, cells, stateful = False, go_backwards = False):
-        return tf.keras.layers.RNN(
-            cells,
-            stateful = stateful,
-            go_backwards = go_backwards,
-            return_sequences = True,
-            zero_output_for_mask = True,
+            RNN_layer = tf.keras.layers.GRU
+        return [
+            RNN_layer(
+                int(configs['num_units']),
+                stateful = stateful,
+                go_backwards = go_backwards,
+                return_sequences = True,
+                return_state = return_state,
+                dtype = dtype,
+            ) for _ in range(int(configs['num_layers']))
+        ]
+
+
+    def __create_step_model__(self, model_configs, data_dimensions):
+        # Single token model with the recurrent states as explicit inputs and
+        # outputs, stacked into one (1, num_states, num_units) tensor, so it
+        # can be converted to TFLite. It shares the weights of self.model.
+        rnn_configs = model_configs['rnn']
+        states_per_layer = 2 if rnn_configs['unit_type'] == 'lstm' else 1
+        #----------------------------------------
+        token = tf.keras.Input(batch_input_shape = (1, 1), dtype = tf.int32)
+        states = tf.keras.Input(
+            batch_input_shape = (
+                1,
+                int(rnn_configs['num_layers']) * states_per_layer,
+                int(rnn_configs['num_units'])
+            ),
+            dtype = tf.float32
         )
+        #----------------------------------------
+        rnn_output = tf.keras.layers.Embedding(
+            input_dim = data_dimensions['tune_vocab_size'],
+            output_dim = int(model_configs['tune_embedding_size']),
+            dtype = 'float32'
+        )(token)
+        #----------------------------------------
+        initial_states = tf.unstack(states, axis = 1)
+        next_states = []
+        RNN_layers = self.create_RNN_layers(rnn_configs, return_state = True, dtype = 'float32')
+        for i, RNN_layer in enumerate(RNN_layers):
+            layer_states = initial_states[i * states_per_layer:(i + 1) * states_per_layer]
+            rnn_output, *layer_states = RNN_layer(rnn_output, initial_state = layer_states)
+            next_states += layer_states
+        #----------------------------------------
+        next_token = tf.keras.layers.Dense(
+            data_dimensions['tune_vocab_size'],
+            dtype = 'float32'
+        )(rnn_output)
+        #----------------------------------------
+        model = tf.keras.Model(
+            inputs = [token, states],
+            outputs = [
+                tf.reshape(next_token, (1, -1)),
+                tf.stack(next_states, axis = 1)
+            ]
+        )
+        model.set_weights(self.model.get_weights())
+        #----------------------------------------
+        return model
 
 
-    def __call_model__(self, input_sequence, sparse=True, training=False):
-        if sparse:
-            input_sequence = tf.squeeze(tf.sparse.to_dense(input_sequence))
+    def __call_model__(self, input_sequence, training=False):
         return self.model([
             input_sequence,
         ])
 
 
-    def loss_function(self, outputs,  targets, weighted = False):
-        mask = tf.math.logical_not(tf.math.equal(outputs, 0))
+    def loss_function(self, logits, targets, pad_mask):
         loss_ = self.cross_entropy(
-            y_pred = outputs, 
+            y_pred = logits, 
             y_true = targets
         )
-        mask = tf.cast(mask, dtype=loss_.dtype)
-        loss_ *= mask
-        return tf.reduce_sum(loss_)/tf.reduce_sum(mask)
+        loss_ *= pad_mask
+        return tf.reduce_sum(loss_)/tf.reduce_sum(pad_mask)
 
 
     def call(self, sequence, training=False):
         return self.__call_model__(sequence['input'])
 
     
-    def grad(self, context, inputs, targets):
+    def _train_step(self, inputs, targets):
         with tf.GradientTape() as tape:
-            outputs = self.__call_model__(inputs)
-            targets = tf.reshape(tf.sparse.to_dense(targets), (-1, 255))
+            outputs = self.model(inputs, training=True)
             loss_value = self.loss_function(
-                outputs = outputs,
-                targets = targets
+                logits = outputs,
+                targets = targets,
+                pad_mask = tf.cast(tf.math.not_equal(targets, 0), outputs.dtype)
+            )
+            if self.loss_scaling:
+                scaled_loss = self.optimizer.get_scaled_loss(loss_value)
+        if self.loss_scaling:
+            gradients = self.optimizer.get_unscaled_gradients(
+                tape.gradient(scaled_loss, self.model.trainable_variables)
             )
-            print(loss_value)
-        gradients = tape.gradient(loss_value, self.model.trainable_variables)
-        gradients = [(tf.clip_by_norm(grad, 3.0)) for grad in gradients]
+        else:
+            gradients = tape.gradient(loss_value, self.model.trainable_variables)
+        gradients, _ = tf.clip_by_global_norm(gradients, 3.0)
         self.optimizer.apply_gradients(zip(gradients, self.model.trainable_variables))
         return loss_value, outputs
 
 
+    def grad(self, context, inputs, targets):
+        # Inputs and targets arrive as dense (batch, max_timesteps) int32 tensors
+        loss_value, outputs = self.train_step_fn(inputs, targets)
+        return loss_value, outputs
+
+
     def update_tensorboard(self, loss, step, grads=None):
-        with self.file_writer.as_default():
-            tf.summary.scalar("Categorical Cross-Entropy", loss, step=step)
-        self.file_writer.flush()
+        # Called inside train, which makes self.file_writer the default writer
+        tf.summary.scalar("Categorical Cross-Entropy", loss, step=step)
 
         
     def map_to_abc_notation(self, output):
-        output = tf.squeeze(tf.argmax(tf.nn.softmax(output), axis = -1)).numpy()
-        abc_tokens = []
-        for token in output:
-            if token:
-                abc_tokens.append(self.vocab['idx_to_word'][str(token)])
-        return ''.join(abc_tokens)
+        tokens = tf.argmax(output, axis = -1).numpy()
+        return ''.join(self.idx_to_word[tokens[tokens != 0]])
 
 
     def save_model_checkpoint(self):
         save_path = self.ckpt_manager.save()
+        self.file_writer.flush()
         print("Saved checkpoint for step {}: {}".format(int(self.ckpt.step), save_path))
 
 
@@ -215,83 +333,193 @@ class FolkLSTM(tf.keras.Model):
 
         epoch_loss_avg = tf.keras.metrics.Mean()
         epoch_accuracy = tf.keras.metrics.SparseCategoricalAccuracy()
+        summary_frequency = configs.get('summary_frequency', DEFAULT_TRAIN_CONFIG['summary_frequency'])
         
-        # Training loop
-        for i, (context, sequence) in enumerate(dataset):
-
-            # Optimize the model
-            loss_value, outputs = self.grad(
-                context,
-                sequence['input'],
-                sequence['output']
-            )
-            self.ckpt.step.assign_add(1)
-            self.update_tensorboard(loss_value, tf.cast(self.ckpt.step, tf.int64))
+        # Summaries go to this instance's writer, not whichever one is the process default
+        with self.file_writer.as_default():
+            # Training loop
+            for i, (context, sequence) in enumerate(dataset):
+
+                # Optimize the model
+                loss_value, outputs = self.grad(
+                    context,
+                    sequence['input'],
+                    sequence['output']
+                )
+                self.ckpt.step.assign_add(1)
+                if i % summary_frequency == 0:
+                    self.update_tensorboard(loss_value, tf.cast(self.ckpt.step, tf.int64))
             
-            if i % configs['print_outputs_frequency'] == 0:
-                abc_outputs = [self.map_to_abc_notation(output) for output in outputs]
-                print('---------- Generated Output -----------')
-                print(abc_outputs[0])
-                print('.......................................')
-                # print('-------------------- Input Sequence --------------------')
-                # self.map_tokens_to_text(tf.sparse.to_dense(sequence['input']), True)
-                # print('--------------------------------------------------')
-                # print('-------------------- Generated Sequence --------------------')
-                # self.map_tokens_to_text(tf.argmax(tf.nn.softmax(outputs), axis = 1), False)
-                # print('--------------------------------------------------')
-                # print('-------------------- Target Sequence --------------------')
-                # self.map_tokens_to_text(tf.sparse.to_dense(sequence['output']), True)
-                # print('--------------------------------------------------')
+                if i % configs['print_outputs_frequency'] == 0:
+                    print('---------- Generated Output -----------')
+                    print(self.map_to_abc_notation(outputs[0]))
+                    print('.......................................')
+                    # print('-------------------- Input Sequence --------------------')
+                    # self.map_tokens_to_text(tf.sparse.to_dense(sequence['input']), True)
+                    # print('--------------------------------------------------')
+                    # print('-------------------- Generated Sequence --------------------')
+                    # self.map_tokens_to_text(tf.argmax(tf.nn.softmax(outputs), axis = 1), False)
+                    # print('--------------------------------------------------')
+                    # print('-------------------- Target Sequence --------------------')
+                    # self.map_tokens_to_text(tf.sparse.to_dense(sequence['output']), True)
+                    # print('--------------------------------------------------')
             
-            if i % configs['save_frequency'] is 0:
-                self.save_model_checkpoint()
+                if i > 0 and i % configs['save_frequency'] == 0:
+                    self.save_model_checkpoint()
         
-            # Track progress
-            epoch_loss_avg.update_state(loss_value)  # Add current batch loss
-            # Compare predicted label to actual label
-            # training=True is needed only if there are layers with different
-            # behavior during training versus inference (e.g. Dropout).
-            # epoch_accuracy.update_state(sequence['output'], self.model(sequence['input'], training=True))
-
-            # End epoch
-            train_loss_results.append(epoch_loss_avg.result())
-            train_accuracy_results.append(epoch_accuracy.result())
+                # Track progress
+                epoch_loss_avg.update_state(loss_value)  # Add current batch loss
+                # Compare predicted label to actual label
+                # training=True is needed only if there are layers with different
+                # behavior during training versus inference (e.g. Dropout).
+                # epoch_accuracy.update_state(sequence['output'], self.model(sequence['input'], training=True))
+
+                # End epoch
+                train_loss_results.append(epoch_loss_avg.result())
+                train_accuracy_results.append(epoch_accuracy.result())
        
-            if (self.ckpt.step % configs['validation_freq']) == 0:
-                print('Step: ' + str(self.ckpt.step) + '\nLoss: ' + str(epoch_loss_avg.result().numpy()) + '\nAccuracy: ' + str(epoch_accuracy.result()))
+                if (self.ckpt.step % configs['validation_freq']) == 0:
+                    print('Step: ' + str(self.ckpt.step) + '\nLoss: ' + str(epoch_loss_avg.result().numpy()) + '\nAccuracy: ' + str(epoch_accuracy.result()))
                 
-            if (self.ckpt.step >= configs['max_steps_for_model']):
-                print('Done with training!')
-                break
+                if (self.ckpt.step >= configs['max_steps_for_model']):
+                    print('Done with training!')
+                    self.save_model_checkpoint()
+                    break
+            self.file_writer.flush()
 
 
             
-    def complete_tune(self, start_tokens, temperature = 1.0):
+    def _sample_token(self, predict_logits, seed, temperature):
+        # Sample the next token from the logits at the last timestep
+        logits = tf.squeeze(predict_logits(seed), 0) / temperature
+        return tf.cast(tf.random.categorical(logits, 1)[-1, 0], tf.int32)
+
+
+    def _sample_tune(self, predict_logits, start_ids, end_id, temperature):
+        # Sampling loop shared by the Keras and TFLite generation paths;
+        # predict_logits maps a (1, timesteps) seed to logits whose last row
+        # along axis 1 belongs to the final seed token
+        generated = tf.TensorArray(tf.int32, size=self.max_timesteps)
+
+        # token is the freshly sampled id; the model only runs again if it is
+        # not the end id and there is room for at least one more token
+        def keep_generating(step, token, seed_id, generated):
+            return tf.logical_and(step < self.max_timesteps - 1, tf.not_equal(token, end_id))
+
+        def generate_token(step, token, seed_id, generated):
+            generated = generated.write(step, token)
+            # Padding predictions are dropped and the previous token is fed again
+            seed_id = tf.where(tf.equal(token, 0), seed_id, token)
+            next_token = self._sample_token(predict_logits, tf.reshape(seed_id, (1, 1)), temperature)
+            return step + 1, next_token, seed_id, generated
+
+        step, token, _, generated = tf.while_loop(
+            keep_generating,
+            generate_token,
+            (
+                tf.constant(0),
+                self._sample_token(predict_logits, start_ids, temperature),
+                start_ids[0, -1],
+                generated
+            )
+        )
+        # The last sampled token, '</s>' or the one hitting the cap, is kept too
+        return generated.write(step, token).stack()[:step + 1]
 
-        current_token = ''
-        text_generated = []
+
+    def _generate_tune(self, start_ids, end_id, temperature):
+        return self._sample_tune(self.model, start_ids, end_id, temperature)
+
+
+    def _complete_tune(self, start_tokens, temperature, generate_tune):
         start_token_idx = [int(self.vocab['word_to_idx'][token]) for token in start_tokens]
-        start_token_idx = tf.expand_dims(start_token_idx, 0)
-        seed = tf.convert_to_tensor(start_token_idx, dtype=tf.int32)
-        
-        self.sequential_RNN.reset_states()      
-        
-        while (1):
-           # Add batch dimension
-            # Pad to max length
-            if (current_token == '</s>'):
-                break
-            #seed = tf.squeeze(tf.sparse.to_dense(seed))
-            predictions = self.model(seed)
-            #print(seed)
-            #print(predictions)
-            # Remove batch dimension
-            predictions = tf.squeeze(predictions, 0)
-            predictions = predictions / temperature
-            predicted_id = tf.random.categorical(predictions, 1)[-1,0].numpy()
-
-            if predicted_id:
-                seed = tf.expand_dims([predicted_id], 0)
-                current_token = self.vocab['idx_to_word'][str(predicted_id)]
-                text_generated.append(current_token)
+        generated_ids = generate_tune(
+            tf.constant([start_token_idx], dtype=tf.int32),
+            tf.constant(int(self.vocab['word_to_idx']['</s>']), dtype=tf.int32),
+            tf.constant(temperature, dtype=tf.float32)
+        ).numpy()
+        text_generated = self.idx_to_word[generated_ids[generated_ids != 0]].tolist()
         return start_tokens + text_generated
+
+
+    def complete_tune(self, start_tokens, temperature = 1.0):
+        self.model.reset_states()
+        return self._complete_tune(start_tokens, temperature, self.generate_tune)
+
+
+    def representative_dataset(self, step_model, dataset, num_tunes = 100):
+        # Replays real tunes through the step model so the quantizer sees
+        # realistic token and recurrent state inputs
+        def generator():
+            for _, sequence in dataset.unbatch().take(num_tunes):
+                states = np.zeros(tuple(step_model.inputs[1].shape), dtype=np.float32)
+                for token in sequence['input'].numpy():
+                    if not token:
+                        break
+                    inputs = [np.array([[token]], dtype=np.int32), states]
+                    yield inputs
+                    states = step_model(inputs)[1].numpy()
+        return generator
+
+
+    def export_tflite(self, dataset = None, num_tunes = 100):
+        # Weights are quantized to int8; passing a dataset of tunes also
+        # calibrates the activations and restricts kernels to int8
+        step_model = self.__create_step_model__(self.model_configs, self.data_dimensions)
+        converter = tf.lite.TFLiteConverter.from_keras_model(step_model)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if dataset is not None:
+            converter.representative_dataset = self.representative_dataset(step_model, dataset, num_tunes)
+            converter.target_spec.supported_types = [tf.int8]
+        with open(self.tflite_path, 'wb') as fp:
+            fp.write(converter.convert())
+        print('Saved quantized model to ' + self.tflite_path)
+        return self.tflite_path
+
+
+    def __load_tflite_generator__(self):
+        interpreter = tf.lite.Interpreter(model_path = self.tflite_path)
+        interpreter.allocate_tensors()
+        # The token is the only int32 input and the logits the only rank 2 output
+        input_details = sorted(
+            interpreter.get_input_details(),
+            key = lambda detail: detail['dtype'] != np.int32
+        )
+        output_details = sorted(
+            interpreter.get_output_details(),
+            key = lambda detail: len(detail['shape'])
+        )
+        token_index, states_index = [detail['index'] for detail in input_details]
+        logits_index, next_states_index = [detail['index'] for detail in output_details]
+        # Recurrent states carried between interpreter calls, like the stateful
+        # Keras model; updated in place so complete_tune_fast can reset them
+        states = np.zeros(input_details[1]['shape'], dtype=np.float32)
+
+        def run_steps(seed):
+            for token in seed[0]:
+                interpreter.set_tensor(token_index, np.array([[token]], dtype=np.int32))
+                interpreter.set_tensor(states_index, states)
+                interpreter.invoke()
+                states[...] = interpreter.get_tensor(next_states_index)
+            return interpreter.get_tensor(logits_index)[np.newaxis]
+
+        def predict_logits(seed):
+            logits = tf.numpy_function(run_steps, [seed], tf.float32)
+            return tf.reshape(logits, (1, 1, -1))
+
+        def generate_tune(start_ids, end_id, temperature):
+            return self._sample_tune(predict_logits, start_ids, end_id, temperature)
+
+        self.tflite_interpreter = interpreter
+        self.tflite_states = states
+        self.generate_tune_fast = tf.function(
+            generate_tune,
+            input_signature = GENERATE_TUNE_SIGNATURE
+        )
+
+
+    def complete_tune_fast(self, start_tokens, temperature = 1.0):
+        if self.tflite_interpreter is None:
+            self.__load_tflite_generator__()
+        self.tflite_states.fill(0)
+        return self._complete_tune(start_tokens, temperature, self.generate_tune_fast)
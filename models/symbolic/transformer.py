@@ -162,11 +162,9 @@ class FolkTransformer(tf.keras.Model):
 
             for i, (context, sequence) in enumerate(dataset):
                 # Optimize the model
-                input_sequence = tf.sparse.to_dense(sequence['input'])
-                target_sequence = tf.sparse.to_dense(sequence['output'])
                 loss_value, outputs = self.grad(
-                    input_sequence,
-                    target_sequence,
+                    sequence['input'],
+                    sequence['output'],
                     self.create_look_ahead_mask(self.data_dimensions['max_timesteps']),
                     self.create_padding_mask(context['tune_length'], self.data_dimensions['max_timesteps'])
                 )